@@ -1,10 +1,15 @@
 import sqlite3
+import sys
 
 con = sqlite3.connect("dev.db")
 cur = con.cursor()
+cur.arraysize = 1000
 
-rows = cur.execute("SELECT id, operator_name, operator_phone, summary, status, created_at FROM tickets").fetchall()
-for row in rows:
-    print(row)
+# Stream rows instead of fetchall() so memory stays flat on large tables
+cur.execute("SELECT id, operator_name, operator_phone, summary, status, created_at FROM tickets")
+write = sys.stdout.write
+for row in cur:
+    write(repr(row))
+    write("\n")
 
 con.close()
@@ -1,30 +1,88 @@
 import os
+from typing import AsyncIterator
+
+import orjson
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, StaticPool
 
 # Load environment
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
 
-# Create engine (SQLite needs a special connect arg)
+# Async driver per backend (same database, used by request handlers)
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _json_dumps(obj) -> str:
+    # JSON columns (AuditEvent.meta) serialize via orjson instead of stdlib json
+    return orjson.dumps(obj).decode()
+
+
+_json_opts = {"json_serializer": _json_dumps, "json_deserializer": orjson.loads}
+
+
+def _sqlite_pragmas(dbapi_conn, _):
+    # WAL lets readers run during writes; NORMAL fsyncs at checkpoints only
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    cur.execute("PRAGMA cache_size=-65536")    # 64 MiB
+    cur.close()
+
+
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend, u.get_driver_name())
+    return u.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
 if DATABASE_URL.startswith("sqlite"):
+    # File DB: pooled connections (one per concurrent worker). In-memory DB only
+    # exists per connection, so all threads share one (and the async engine
+    # then sees its own, separate in-memory DB).
+    _in_memory = DATABASE_URL in ("sqlite://", "sqlite:///") or ":memory:" in DATABASE_URL
+    # Sync engine: Alembic, scripts and the batched audit writer thread
+    # (SQLite needs a special connect arg)
     engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool if _in_memory else QueuePool,
+        **_json_opts,
+    )
+    # Async engine: request handlers (aiosqlite; default async-adapted queue pool)
+    async_engine = create_async_engine(
+        _async_url(DATABASE_URL),
+        **({"poolclass": StaticPool} if _in_memory else {}),
+        **_json_opts,
     )
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
 else:
-    engine = create_engine(DATABASE_URL)
+    _pool_opts = {
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_pre_ping": True,   # drop connections the server closed
+        "pool_recycle": 1800,    # and recycle before idle timeouts hit
+    }
+    engine = create_engine(DATABASE_URL, **_pool_opts, **_json_opts)
+    async_engine = create_async_engine(_async_url(DATABASE_URL), **_pool_opts, **_json_opts)
 
-# Session factory
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) refresh
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for ORM models
 Base = declarative_base()
 
 # FastAPI dependency for DB sessions
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
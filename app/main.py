@@ -1,4 +1,5 @@
 # ruff: noqa: E402
+from contextlib import asynccontextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -6,10 +7,26 @@ from dotenv import load_dotenv
 load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env")
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.routes.public import public_router
 from app.routes import admin as admin_routes
+from app.database import async_engine
+from app.utils import audit, rate_limit
+from app.utils.emailer import close_smtp_pool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Batched audit writer runs for the lifetime of the worker
+    audit.start()
+    yield
+    audit.stop()  # drain queued events before exit
+    await rate_limit.close()
+    await close_smtp_pool()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Routers
 app.include_router(public_router, prefix="/public")
@@ -10,7 +10,7 @@ from sqlalchemy import (
     Text,
     JSON,
     Enum,
-    UniqueConstraint,
+    Index,
     func,
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column
@@ -43,6 +43,8 @@ class Machine(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     # Relationships
+    # Both stay lazy so loading a Machine never pulls its tokens or its unbounded
+    # ticket history; query sites that need them add selectinload(...)
     qr_tokens: Mapped[list["QRToken"]] = relationship("QRToken", back_populates="machine", cascade="all, delete-orphan")
     tickets: Mapped[list["Ticket"]] = relationship("Ticket", back_populates="machine", cascade="all, delete-orphan")
 
@@ -70,8 +72,8 @@ class QRToken(Base):
 class Ticket(Base):
     __tablename__ = "tickets"
     __table_args__ = (
-        # Keep summaries short for UI/export; enforced again at API level
-        UniqueConstraint("id", name="uq_tickets_id"),
+        # Admin listings: WHERE status = ? ORDER BY created_at DESC
+        Index("ix_tickets_status_created", "status", "created_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -86,8 +88,8 @@ class Ticket(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     # Relationships
-    machine: Mapped[Optional["Machine"]] = relationship("Machine", back_populates="tickets")
-    emails: Mapped[list["EmailLog"]] = relationship("EmailLog", back_populates="ticket", cascade="all, delete-orphan")
+    machine: Mapped[Optional["Machine"]] = relationship("Machine", back_populates="tickets", lazy="joined")
+    emails: Mapped[list["EmailLog"]] = relationship("EmailLog", back_populates="ticket", cascade="all, delete-orphan", lazy="selectin")
 
     def __repr__(self) -> str:
         return f"<Ticket id={self.id} status={self.status}>"
@@ -113,6 +115,7 @@ class EmailLog(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     # Relationships
+    # Lazy: a joined default here would re-join tickets (and machines) into every email load
     ticket: Mapped["Ticket"] = relationship("Ticket", back_populates="emails")
 
     def __repr__(self) -> str:
@@ -121,6 +124,11 @@ class EmailLog(Base):
 
 class AuditEvent(Base):
     __tablename__ = "audit_events"
+    __table_args__ = (
+        # Time-range reports and per-entity history
+        Index("ix_audit_events_created_at", "created_at"),
+        Index("ix_audit_events_entity", "entity_type", "entity_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     actor: Mapped[str] = mapped_column(String(120), nullable=False)   # e.g., 'public:operator', 'admin:username'
@@ -1,15 +1,16 @@
 # app/routes/admin.py
-from typing import Optional, Dict, Any
+from typing import Optional, Any, Mapping
 
 import bcrypt
+import functools
 import hmac
 import hashlib
 import secrets
 import time
 import io
-import base64
 import re
-import qrcode
+import segno
+from urllib.parse import urlencode
 
 from fastapi import (
     APIRouter,
@@ -21,42 +22,34 @@ from fastapi import (
     HTTPException,
 )
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
+from app.templates_env import templates
 from app.utils.urls import build_public_form_url
-from app.utils import settings
+from app.utils.settings import settings
 from app.utils import session as sess
 from app.utils import csrf as csrf_utils
 from app.utils import rate_limit, flash
 
-# --- Templates ---
-templates = Jinja2Templates(directory="app/templates")
-templates.env.globals["csrf_token"] = csrf_utils.get_csrf_from_request
-
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Credentials are import-time constants; normalize/encode them once
+_ADMIN_USER_NORM = settings.ADMIN_USER.strip().lower()
+_ADMIN_PASS_HASH_B = settings.ADMIN_PASS_HASH.encode()
+
 # --- Optional DB/Audit (soft-fail if schema differs) ---
 try:
-    from app.database import get_db
-    from app.models import AuditEvent
+    from app.utils import audit
 except Exception:  # pragma: no cover
-    get_db = None
-    AuditEvent = None  # type: ignore
+    audit = None  # type: ignore
 
 
 def _audit_safe(request: Request, kind: str, actor: str = "", note: str = "") -> None:
-    """Try to write an AuditEvent; ignore if model/schema differs."""
-    if not get_db or not AuditEvent:
+    """Queue an AuditEvent for the batched writer; never blocks the request."""
+    if not audit:
         return
-    try:
-        db = next(get_db())
-        ip = request.client.host if request.client else ""
-        evt = AuditEvent(event_type=kind, actor=actor or ip, note=note)
-        db.add(evt)
-        db.commit()
-    except Exception:
-        # Silent fail; we’ll refine once models are finalized
-        pass
+    ip = request.client.host if request.client else ""
+    audit.record(actor or ip, kind, "admin", meta={"ip": ip, "note": note or None})
 
 
 # ---------------------------
@@ -66,8 +59,29 @@ _PRELOGIN_COOKIE = "qr_prelogin_csrf"
 _PRELOGIN_TTL_S = 600  # 10 minutes
 
 
+# BLAKE2b key for pre-login CSRF tokens and username digests (max 64 bytes;
+# longer secrets are hashed down rather than truncated)
+_MAC_KEY = settings.SESSION_SECRET.encode()
+if len(_MAC_KEY) > 64:
+    _MAC_KEY = hashlib.blake2b(_MAC_KEY).digest()
+
+
 def _sign(msg: bytes) -> bytes:
-    return hmac.new(settings.SESSION_SECRET.encode(), msg, hashlib.sha256).digest()
+    # Keyed BLAKE2b: single pass, no HMAC double-hash. Same 32-byte / hex wire
+    # format as before, but tokens issued by older builds (<= 10 min old) fail.
+    return hashlib.blake2b(msg, key=_MAC_KEY, digest_size=32).digest()
+
+
+def _user_digest(username: str) -> bytes:
+    return hashlib.blake2b(username.strip().lower().encode(), key=_MAC_KEY, digest_size=16).digest()
+
+
+_ADMIN_USER_HASH = _user_digest(_ADMIN_USER_NORM)
+
+
+def _username_matches(username: str) -> bool:
+    # Compare fixed-size keyed digests so timing does not depend on length/prefix
+    return hmac.compare_digest(_user_digest(username), _ADMIN_USER_HASH)
 
 
 def _issue_prelogin_csrf() -> str:
@@ -93,9 +107,8 @@ def _verify_prelogin_csrf(cookie_val: Optional[str], form_val: Optional[str]) ->
 # ---------------------------
 # Guard (require_admin)
 # ---------------------------
-def require_admin(request: Request) -> Dict[str, Any]:
-    cookie = request.cookies.get(settings.SESSION_COOKIE_NAME)
-    payload = sess.verify_session(cookie)  # dict on success, falsy on failure
+def require_admin(request: Request) -> Mapping[str, Any]:
+    payload = sess.session_from_request(request)  # dict on success, None on failure
     if not payload:
         # Dependencies must raise exceptions, not return Response objects
         raise HTTPException(
@@ -120,7 +133,7 @@ def get_login(request: Request) -> Response:
     # 2) Read flash messages from the incoming request cookie first
     flash_cookie = request.cookies.get(settings.FLASH_COOKIE_NAME)
     from app.utils import flash as flash_mod  # local alias, safe helper
-    msgs = flash_mod._decode(flash_cookie) if flash_cookie else []  # returns [] on bad/missing
+    msgs = flash_mod._decode(flash_cookie) if flash_cookie else ()  # () on bad/missing
 
     # 3) Build the response with messages already in the context
     response = templates.TemplateResponse(
@@ -159,7 +172,7 @@ async def post_login(
 ) -> Response:
     # Rate limit check
     ip = request.client.host if request.client else "unknown"
-    allowed, retry_after = rate_limit.check(ip)
+    allowed, retry_after = await rate_limit.check(ip)
     if not allowed:
         resp = RedirectResponse(url="/admin/login", status_code=status.HTTP_303_SEE_OTHER)
         flash.add(resp, "error", "too_many_attempts")
@@ -173,28 +186,24 @@ async def post_login(
         _audit_safe(request, "admin.login.failure", actor=username, note="csrf")
         return resp
 
-    # Credential check (generic error on failure)
-    if username.strip().lower() != settings.ADMIN_USER.strip().lower():
-        rate_limit.record_failure(ip)
-        resp = RedirectResponse(url="/admin/login", status_code=status.HTTP_303_SEE_OTHER)
-        flash.add(resp, "error", "invalid_credentials")
-        _audit_safe(request, "admin.login.failure", actor=username, note="user")
-        return resp
-
+    # Credential check (generic error on failure). bcrypt runs whether or not
+    # the username matched, so both rejections take the same time.
+    user_ok = _username_matches(username)
     try:
-        ok = bcrypt.checkpw(password.encode(), settings.ADMIN_PASS_HASH.encode())
+        # bcrypt is deliberately slow; keep it off the event loop
+        pw_ok = await run_in_threadpool(bcrypt.checkpw, password.encode(), _ADMIN_PASS_HASH_B)
     except Exception:
-        ok = False
+        pw_ok = False
 
-    if not ok:
-        rate_limit.record_failure(ip)
+    if not (user_ok and pw_ok):
+        await rate_limit.record_failure(ip)
         resp = RedirectResponse(url="/admin/login", status_code=status.HTTP_303_SEE_OTHER)
         flash.add(resp, "error", "invalid_credentials")
-        _audit_safe(request, "admin.login.failure", actor=username, note="password")
+        _audit_safe(request, "admin.login.failure", actor=username, note="user" if not user_ok else "password")
         return resp
 
     # Success → clear limiter and issue session
-    rate_limit.record_success(ip)
+    await rate_limit.record_success(ip)
     cookie_val = sess.issue_session(admin_id=username)
 
     resp = RedirectResponse(url="/admin", status_code=status.HTTP_303_SEE_OTHER)
@@ -219,6 +228,7 @@ async def post_logout(request: Request) -> Response:
 
     resp = RedirectResponse(url="/admin/login", status_code=status.HTTP_303_SEE_OTHER)
     # Clear session
+    sess.forget_session(request.cookies.get(settings.SESSION_COOKIE_NAME))
     params = sess.clear_cookie_params()
     resp.delete_cookie(key=params["key"], path=params["path"])
     _audit_safe(request, "admin.logout", actor="admin")
@@ -229,7 +239,7 @@ async def post_logout(request: Request) -> Response:
 # Dashboard (protected)
 # ---------------------------
 @router.get("", name="admin_dashboard")
-def admin_dashboard(request: Request, payload: Dict[str, Any] = Depends(require_admin)) -> Response:
+def admin_dashboard(request: Request, payload: Mapping[str, Any] = Depends(require_admin)) -> Response:
     """
     Admin landing page (dashboard). Requires a valid admin session.
     """
@@ -251,8 +261,54 @@ def admin_dashboard(request: Request, payload: Dict[str, Any] = Depends(require_
 # ---------------------------
 # QR Generator (protected)
 # ---------------------------
+_SLUG_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _slug(s: str) -> str:
+    return _SLUG_RE.sub("_", (s or "").strip()).strip("_")
+
+
+def _qr_inputs_error(mt: str, sn: str) -> Optional[str]:
+    if not mt or not sn:
+        return "missing_fields"
+    if len(mt) > 64 or len(sn) > 64:
+        return "input_too_long"
+    return None
+
+
+# HTTP status per _qr_inputs_error code (form POST and PNG GET alike)
+_QR_ERROR_STATUS = {
+    "missing_fields": status.HTTP_400_BAD_REQUEST,
+    "input_too_long": status.HTTP_422_UNPROCESSABLE_ENTITY,
+}
+
+
+@functools.lru_cache(maxsize=2048)
+def _render_qr_png(public_url: str) -> bytes:
+    """
+    Render the QR PNG for a public URL. Output is deterministic per URL
+    (which already includes the host), so it is cached.
+    """
+    qr = segno.make_qr(
+        public_url,
+        error="m",          # medium (~15% recovery)
+        boost_error=False,  # keep level M even if a higher one would fit
+    )
+    buf = io.BytesIO()
+    qr.save(
+        buf,
+        kind="png",
+        scale=10,   # pixel size of each module
+        border=2,   # quiet zone (2-4 typical)
+    )
+    return buf.getvalue()
+
+
 @router.get("/qr", name="admin_qr_form")
-def admin_qr_form(request: Request, payload: Dict[str, Any] = Depends(require_admin)) -> Response:
+def admin_qr_form(
+    request: Request,
+    payload: Mapping[str, Any] = Depends(require_admin),
+) -> Response:
     """
     Render the QR Generator form.
     """
@@ -277,10 +333,10 @@ async def admin_qr_submit(
     machine_type: str = Form(...),
     serial: str = Form(...),
     csrf_token: str = Form(..., alias="_csrf"),
-    payload: Dict[str, Any] = Depends(require_admin),
+    payload: Mapping[str, Any] = Depends(require_admin),
 ) -> Response:
     """
-    Validate CSRF + inputs, then build the public URL + QR PNG (base64) and
+    Validate CSRF + inputs, then build the public URL + QR image link and
     re-render the form showing both.
     """
     # CSRF
@@ -302,51 +358,30 @@ async def admin_qr_submit(
     # Basic normalization/validation (MVP)
     mt = (machine_type or "").strip()
     sn = (serial or "").strip()
-    if not mt or not sn:
+    error = _qr_inputs_error(mt, sn)
+    if error:
         return templates.TemplateResponse(
             "admin/qr_generator.html",
             {
                 "request": request,
                 "title": "QR Generator",
                 "payload": payload,
-                "messages": [{"level": "error", "code": "missing_fields"}],
+                "messages": [{"level": "error", "code": error}],
             },
-            status_code=status.HTTP_400_BAD_REQUEST,
-        )
-    if len(mt) > 64 or len(sn) > 64:
-        return templates.TemplateResponse(
-            "admin/qr_generator.html",
-            {
-                "request": request,
-                "title": "QR Generator",
-                "payload": payload,
-                "messages": [{"level": "error", "code": "input_too_long"}],
-            },
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            status_code=_QR_ERROR_STATUS[error],
         )
 
     # Build absolute public URL to prefill the public form
     lang = request.query_params.get("lang")
     public_url = build_public_form_url(request, mt, sn, lang)
 
-    # Generate QR PNG in-memory and base64-encode it
-    qr = qrcode.QRCode(
-        version=None,  # automatic
-        error_correction=qrcode.constants.ERROR_CORRECT_M,  # medium (~15% recovery)
-        box_size=10,  # pixel size of each "box"
-        border=2,     # quiet zone (2-4 typical)
-    )
-    qr.add_data(public_url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    qr_png_b64 = base64.b64encode(buf.getvalue()).decode("ascii")
+    # The PNG itself is served (and browser-cached) by GET /admin/qr.png
+    qr_params = {"mt": mt, "sn": sn}
+    if lang:
+        qr_params["lang"] = lang
+    qr_png_url = f"/admin/qr.png?{urlencode(qr_params)}"
 
     # Build a safe download filename, e.g., MTC-45_1234.png
-    def _slug(s: str) -> str:
-        return re.sub(r"[^A-Za-z0-9._-]+", "_", (s or "").strip()).strip("_")
-
     download_filename = f"{_slug(mt)}_{_slug(sn)}.png"
 
     _audit_safe(request, "admin.qr.generated", note=f"machine_type={mt}, serial={sn}")
@@ -358,10 +393,38 @@ async def admin_qr_submit(
             "title": "QR Generator",
             "payload": payload,
             "public_url": public_url,
-            "qr_png_b64": qr_png_b64,
+            "qr_png_url": qr_png_url,
             "machine_type": mt,
             "serial": sn,
             "download_filename": download_filename,
             "messages": [{"level": "success", "code": "qr_generated"}],
         },
     )
+
+
+@router.get("/qr.png", name="admin_qr_png")
+def admin_qr_png(
+    request: Request,
+    mt: str,
+    sn: str,
+    lang: Optional[str] = None,
+    payload: Mapping[str, Any] = Depends(require_admin),
+) -> Response:
+    """
+    Serve the QR PNG for a machine type + serial (same URL the form shows).
+    """
+    mt = mt.strip()
+    sn = sn.strip()
+    error = _qr_inputs_error(mt, sn)
+    if error:
+        raise HTTPException(status_code=_QR_ERROR_STATUS[error], detail=error)
+
+    public_url = build_public_form_url(request, mt, sn, lang)
+    return Response(
+        content=_render_qr_png(public_url),
+        media_type="image/png",
+        headers={
+            "Cache-Control": "private, max-age=3600",
+            "Content-Disposition": f'attachment; filename="{_slug(mt)}_{_slug(sn)}.png"',
+        },
+    )
@@ -1,48 +1,178 @@
-from typing import List, Dict, Optional
+import hashlib
+import logging
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional
 
-from fastapi import APIRouter, Request, Form, Depends
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Request, Response, Form, Depends
+from fastapi.responses import HTMLResponse
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db
 from app import models
+from app.utils import audit
 from app.utils.emailer import send_support_email  # <-- added
+from app.templates_env import templates
+from app.utils.settings import settings
 
 public_router = APIRouter(tags=["public"])
 
-# Jinja2 template engine (path is from project root)
-templates = Jinja2Templates(directory="app/templates")
+logger = logging.getLogger(__name__)
+
+# Dialect-specific INSERT constructs that support ON CONFLICT
+_UPSERT_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+SUPPORT_TO_ADDR = "tyson.smith@epiqmachinery.com"
+
+# Form messages, (key, lang) -> read-only {"level", "text"}; shared across
+# requests, so they're frozen against mutation from handlers/templates.
+_MSG_TEXT = {
+    "bot": ("error", "Bot submission blocked.", "Soumission automatisée bloquée."),
+    "name": ("error", "Name is required.", "Le nom est requis."),
+    "phone": ("error", "Phone number is required.", "Le numéro de téléphone est requis."),
+    "summary": ("error", "Issue summary is required.", "Le résumé du problème est requis."),
+    "summary_len": (
+        "error",
+        "Issue summary must be 255 characters or less.",
+        "Le résumé doit contenir 255 caractères ou moins.",
+    ),
+    "success": ("success", "Ticket submitted. Thank you!", "Billet soumis. Merci!"),
+}
+_MSG: Mapping[tuple, Mapping[str, str]] = MappingProxyType(
+    {
+        (key, lang): MappingProxyType({"level": level, "text": text})
+        for key, (level, en, fr) in _MSG_TEXT.items()
+        for lang, text in (("en", en), ("fr", fr))
+    }
+)
+
+
+# GET /form output depends only on these template sources and the query string,
+# so its ETag is a digest of both; the source part is computed once at import
+# (per request in DEBUG, so template edits change the ETag).
+# private: the page echoes query params, so shared caches must not store it.
+_FORM_TEMPLATES = ("form.html", "base.html", "_flash.html")
+_FORM_CACHE_CONTROL = "private, max-age=60"
+
+
+def _templates_digest(names) -> bytes:
+    root = Path(__file__).resolve().parents[1] / "templates"
+    h = hashlib.blake2b(digest_size=16)
+    for name in names:
+        path = root / name
+        h.update(path.read_bytes() if path.exists() else b"")
+    return h.digest()
+
+
+_FORM_SRC_DIGEST = _templates_digest(_FORM_TEMPLATES)
+
+_PONG_BODY = b'{"pong":true}'
+
+# Compiled once; rendered straight into an HTMLResponse (no TemplateResponse
+# lookup per request). In DEBUG, fetch per render so template edits show up.
+_FORM_TEMPLATE = templates.get_template("form.html")
+
+
+def _render_form(request: Request, status_code: int = 200, **context) -> HTMLResponse:
+    tmpl = templates.get_template("form.html") if settings.DEBUG else _FORM_TEMPLATE
+    return HTMLResponse(tmpl.render(request=request, **context), status_code=status_code)
+
+
+def _form_etag(query: str) -> str:
+    src = _templates_digest(_FORM_TEMPLATES) if settings.DEBUG else _FORM_SRC_DIGEST
+    return '"%s"' % hashlib.blake2b(query.encode(), key=src, digest_size=16).hexdigest()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag in tags or "*" in tags
+
+
+async def _send_ticket_email(ticket_id: int, to_addr: str, email_context: Dict[str, str]) -> None:
+    """
+    Background task (runs after the response): render + send the support email,
+    persist email_log, and audit the outcome. Never raises.
+    """
+    try:
+        # Send (SMTP or .eml fallback per settings)
+        email_result = await send_support_email(to_addr=to_addr, context=email_context)
+
+        # Persist email_log
+        email_log = models.EmailLog(
+            ticket_id=ticket_id,
+            to_addr=to_addr,
+            subject=email_result.get("subject", ""),
+            body=email_result.get("text", ""),  # store plain text for easy searching
+            status=(
+                models.EmailStatus.sent
+                if email_result.get("status") == "sent"
+                else models.EmailStatus.failed
+            ),
+        )
+        # Optional observability fields (added by migration)
+        setattr(email_log, "provider_message_id", email_result.get("provider_message_id"))
+        setattr(email_log, "error", email_result.get("error"))
+        setattr(email_log, "payload_hash", email_result.get("payload_hash"))
+
+        async with AsyncSessionLocal() as db:
+            db.add(email_log)
+            await db.commit()
+
+        # Audit event for email send outcome
+        audit.record(
+            "public:operator",
+            "email.send.success" if email_result.get("status") == "sent" else "email.send.failure",
+            "ticket",
+            ticket_id,
+            meta={
+                "to": to_addr,
+                "subject": email_result.get("subject"),
+                "status": email_result.get("status"),
+                "error": email_result.get("error"),
+            },
+        )
+    except Exception:
+        # The user already got their success page; failed sends keep a local .eml copy.
+        logger.exception("support email task failed for ticket %s", ticket_id)
 
 
 @public_router.get("/ping")
-def ping():
-    return {"pong": True}
+async def ping():
+    return Response(_PONG_BODY, media_type="application/json")
 
 
 @public_router.get("/form")
-def show_form(request: Request):
+async def show_form(request: Request):
+    etag = _form_etag(request.url.query)
+    cache_headers = {"ETag": etag, "Cache-Control": _FORM_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
     qs = request.query_params
-    return templates.TemplateResponse(
-        "form.html",
-        {
-            "request": request,
-            "messages": [],
-            "machine_serial": qs.get("machine_serial", ""),
-            "machine_type": qs.get("machine_type", ""),
-        },
+    resp = _render_form(
+        request,
+        messages=(),
+        machine_serial=qs.get("machine_serial", ""),
+        machine_type=qs.get("machine_type", ""),
     )
+    resp.headers.update(cache_headers)
+    return resp
 
 
 @public_router.post("/form")
-def submit_form(
+async def submit_form(
     request: Request,
+    background_tasks: BackgroundTasks,
     machine_serial: str = Form(""),
     machine_type: str = Form(""),
     operator_name: str = Form(""),
     operator_phone: str = Form(""),
     summary: str = Form(""),
     website: str = Form(""),  # honeypot; must be empty
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Basic validation + DB insert:
@@ -50,160 +180,99 @@ def submit_form(
     - summary <= 255 chars
     - honeypot 'website' must be empty
     - optional machine_serial/type: link ticket to an existing machine or create it
+    - audit + support email run after the response (batched writer / background task)
     """
-    messages: List[Dict[str, str]] = []
-    lang = request.query_params.get("lang", "en")
+    messages: List[Mapping[str, str]] = []
+    lang = "en" if request.query_params.get("lang", "en") == "en" else "fr"
 
     # --- Validation ---
     if website.strip():
-        messages.append(
-            {"level": "error", "text": "Bot submission blocked." if lang == "en" else "Soumission automatisée bloquée."}
-        )
+        messages.append(_MSG[("bot", lang)])
     if not operator_name.strip():
-        messages.append(
-            {"level": "error", "text": "Name is required." if lang == "en" else "Le nom est requis."}
-        )
+        messages.append(_MSG[("name", lang)])
     if not operator_phone.strip():
-        messages.append(
-            {"level": "error", "text": "Phone number is required." if lang == "en" else "Le numéro de téléphone est requis."}
-        )
+        messages.append(_MSG[("phone", lang)])
     if not summary.strip():
-        messages.append(
-            {"level": "error", "text": "Issue summary is required." if lang == "en" else "Le résumé du problème est requis."}
-        )
+        messages.append(_MSG[("summary", lang)])
     if len(summary) > 255:
-        messages.append(
-            {"level": "error", "text": "Issue summary must be 255 characters or less." if lang == "en" else "Le résumé doit contenir 255 caractères ou moins."}
-        )
+        messages.append(_MSG[("summary_len", lang)])
 
     if messages:
         # Re-render with errors and preserve user input
-        return templates.TemplateResponse(
-            "form.html",
-            {
-                "request": request,
-                "messages": messages,
-                "machine_serial": machine_serial,
-                "machine_type": machine_type,
-                "operator_name": operator_name,
-                "operator_phone": operator_phone,
-                "summary": summary,
-            },
+        return _render_form(
+            request,
             status_code=400,
+            messages=messages,
+            machine_serial=machine_serial,
+            machine_type=machine_type,
+            operator_name=operator_name,
+            operator_phone=operator_phone,
+            summary=summary,
         )
 
     # --- Find-or-create Machine (optional) ---
+    # One round-trip, race-free on the unique serial index: insert, or no-op
+    # update of the existing row (type is kept as first registered), then RETURNING id.
     machine_id: Optional[int] = None
     if machine_serial.strip() and machine_type.strip():
-        existing = (
-            db.query(models.Machine)
-            .filter(models.Machine.serial == machine_serial.strip())
-            .one_or_none()
+        stmt = _UPSERT_INSERT[db.bind.dialect.name](models.Machine).values(
+            serial=machine_serial.strip(), type=machine_type.strip()
         )
-        if existing:
-            machine = existing
-        else:
-            machine = models.Machine(serial=machine_serial.strip(), type=machine_type.strip())
-            db.add(machine)
-            db.flush()  # get machine.id without full commit
-        machine_id = machine.id
-
-    # --- Create Ticket ---
-    ticket = models.Ticket(
-        machine_id=machine_id,
-        operator_name=operator_name.strip(),
-        operator_phone=operator_phone.strip(),
-        summary=summary.strip(),
-        status=models.TicketStatus.new,
-    )
-    db.add(ticket)
-    db.flush()  # ensure ticket.id is available
-
-    # --- Audit event (link directly to the new ticket) ---
-    audit = models.AuditEvent(
-        actor="public:operator",
-        action="ticket.create",
-        entity_type="ticket",
-        entity_id=ticket.id,  # <-- set here, no raw SQL
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.Machine.serial],
+            set_={"serial": stmt.excluded.serial},
+        ).returning(models.Machine.id)
+        machine_id = (await db.execute(stmt)).scalar_one()
+
+    # --- Create Ticket (INSERT ... RETURNING id: no ORM flush round-trip) ---
+    ticket_id = (
+        await db.execute(
+            insert(models.Ticket)
+            .values(
+                machine_id=machine_id,
+                operator_name=operator_name.strip(),
+                operator_phone=operator_phone.strip(),
+                summary=summary.strip(),
+                status=models.TicketStatus.new,
+            )
+            .returning(models.Ticket.id)
+        )
+    ).scalar_one()
+
+    await db.commit()  # connection goes back to the pool here, before any rendering
+
+    # --- Audit event (link directly to the new ticket; batched writer) ---
+    audit.record(
+        "public:operator",
+        "ticket.create",
+        "ticket",
+        ticket_id,
         meta={
             "machine_serial": machine_serial.strip() or None,
             "machine_type": machine_type.strip() or None,
         },
     )
-    db.add(audit)
-
-    db.commit()
-
-    # --- Email: render + send + log (non-blocking for UX) ---
-    try:
-        email_context = {
-            "machine_type": machine_type.strip(),
-            "machine_serial": machine_serial.strip(),
-            "operator_name": operator_name.strip(),
-            "operator_phone": operator_phone.strip(),
-            "issue_summary": summary.strip(),
-        }
-        to_addr = "tyson.smith@epiqmachinery.com"
-
-        # Send (SMTP or .eml fallback per settings)
-        email_result = send_support_email(to_addr=to_addr, context=email_context)
-
-        # Persist email_log
-        email_log = models.EmailLog(
-            ticket_id=ticket.id,
-            to_addr=to_addr,
-            subject=email_result.get("subject", ""),
-            body=email_result.get("text", ""),  # store plain text for easy searching
-            status=(
-                models.EmailStatus.sent
-                if email_result.get("status") == "sent"
-                else models.EmailStatus.failed
-            ),
-        )
-        # Optional observability fields (added by migration)
-        setattr(email_log, "provider_message_id", email_result.get("provider_message_id"))
-        setattr(email_log, "error", email_result.get("error"))
-        setattr(email_log, "payload_hash", email_result.get("payload_hash"))
-
-        db.add(email_log)
 
-        # Audit event for email send outcome
-        audit_email = models.AuditEvent(
-            actor="public:operator",
-            action="email.send.success" if email_result.get("status") == "sent" else "email.send.failure",
-            entity_type="ticket",
-            entity_id=ticket.id,
-            meta={
-                "to": to_addr,
-                "subject": email_result.get("subject"),
-                "status": email_result.get("status"),
-                "error": email_result.get("error"),
-            },
-        )
-        db.add(audit_email)
-
-        db.commit()
-    except Exception:
-        # Do not leak errors to user; keep UI success.
-        db.rollback()
-        # Optional: could add a minimal audit here if desired.
-        pass
+    # --- Email: render + send + log after the response is sent ---
+    email_context = {
+        "machine_type": machine_type.strip(),
+        "machine_serial": machine_serial.strip(),
+        "operator_name": operator_name.strip(),
+        "operator_phone": operator_phone.strip(),
+        "issue_summary": summary.strip(),
+    }
+    background_tasks.add_task(_send_ticket_email, ticket_id, SUPPORT_TO_ADDR, email_context)
 
     # --- Success response ---
-    messages.append(
-        {"level": "success", "text": "Ticket submitted. Thank you!" if lang == "en" else "Billet soumis. Merci!"}
-    )
-    return templates.TemplateResponse(
-        "form.html",
-        {
-            "request": request,
-            "messages": messages,
-            "machine_serial": machine_serial,  # keep these visible for operator
-            "machine_type": machine_type,
-            # Clear operator fields after success
-            "operator_name": "",
-            "operator_phone": "",
-            "summary": "",
-        },
+    messages.append(_MSG[("success", lang)])
+    return _render_form(
+        request,
         status_code=201,
+        messages=messages,
+        machine_serial=machine_serial,  # keep these visible for operator
+        machine_type=machine_type,
+        # Clear operator fields after success
+        operator_name="",
+        operator_phone="",
+        summary="",
     )
@@ -0,0 +1,17 @@
+# app/templates_env.py
+# Shared Jinja2 templates for all routers: one environment (and compiled-template
+# cache) per worker instead of one per router module.
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+
+from app.utils.settings import settings
+from app.utils import csrf as csrf_utils
+
+templates = Jinja2Templates(directory="app/templates")
+
+# Compiled bytecode persists across worker restarts (per-user temp dir)
+templates.env.bytecode_cache = FileSystemBytecodeCache()
+# Outside DEBUG, skip the per-render source mtime check
+templates.env.auto_reload = settings.DEBUG
+
+templates.env.globals["csrf_token"] = csrf_utils.get_csrf_from_request
@@ -0,0 +1,124 @@
+# app/utils/audit.py
+# Batched AuditEvent writer: callers enqueue rows, a daemon thread bulk-inserts them.
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.database import SessionLocal
+from app.models import AuditEvent
+
+BATCH_MAX = 500          # rows per INSERT/COMMIT
+FLUSH_INTERVAL_S = 0.25  # max time a row waits in the queue
+STOP_TIMEOUT_S = 5.0
+
+logger = logging.getLogger(__name__)
+
+_queue: "queue.SimpleQueue[Dict[str, Any]]" = queue.SimpleQueue()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def enqueue(row: Dict[str, Any]) -> None:
+    """
+    Queue one AuditEvent mapping (column name -> value). Without a running
+    writer (scripts, no lifespan) the row is written synchronously instead, so
+    nothing piles up in a queue that no one drains.
+    """
+    if _thread is None or not _thread.is_alive():
+        _flush([row])
+        return
+    _queue.put(row)
+
+
+def record(
+    actor: str,
+    action: str,
+    entity_type: str,
+    entity_id: Optional[int] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Queue an AuditEvent; created_at is the time of the call, not of the flush."""
+    enqueue(
+        {
+            "actor": actor[:120],
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "meta": meta,
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),  # naive UTC column
+        }
+    )
+
+
+def _drain(max_items: int, timeout: float) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    try:
+        items.append(_queue.get(timeout=timeout) if timeout > 0 else _queue.get_nowait())
+    except queue.Empty:
+        return items
+    while len(items) < max_items:
+        try:
+            items.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+
+def _insert(items: List[Dict[str, Any]]) -> None:
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(AuditEvent, items)
+        db.commit()
+
+
+def _flush(items: List[Dict[str, Any]]) -> None:
+    # Auditing must never break the app: failures are logged, not raised
+    try:
+        _insert(items)
+        return
+    except Exception:
+        if len(items) == 1:
+            logger.warning("audit insert failed; 1 event dropped", exc_info=True)
+            return
+        logger.warning("audit batch insert failed (%d events); retrying one by one", len(items), exc_info=True)
+    # One bad row (or a transient lock) must not take the rest of the batch with it
+    dropped = 0
+    for row in items:
+        try:
+            _insert([row])
+        except Exception:
+            dropped += 1
+    if dropped:
+        logger.warning("audit: dropped %d of %d events", dropped, len(items))
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        items = _drain(BATCH_MAX, FLUSH_INTERVAL_S)
+        if items:
+            _flush(items)
+
+
+def start() -> None:
+    """Start the writer thread (FastAPI startup)."""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="audit-writer", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    """Stop the writer thread and flush whatever is still queued (FastAPI shutdown)."""
+    global _thread
+    _stop.set()
+    if _thread:
+        _thread.join(STOP_TIMEOUT_S)
+        _thread = None
+    while True:
+        items = _drain(BATCH_MAX, 0)
+        if not items:
+            break
+        _flush(items)
@@ -3,28 +3,127 @@ Email utility functions for QR Support App.
 Phase 5: rendering + sending support emails.
 """
 
-from typing import Dict
+from typing import Dict, Optional
 from pathlib import Path
+import asyncio
 import hashlib
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
 # New imports for sending / writing .eml
-import smtplib
+import secrets
 import ssl
+import time
 from email.message import EmailMessage
-from datetime import datetime
-from uuid import uuid4
+
+import aiosmtplib
 
 # Settings
-from app.utils.settings import (
-    EMAIL_ENABLED,
-    SMTP_HOST,
-    SMTP_PORT,
-    SMTP_USER,
-    SMTP_PASS,
-    SMTP_STARTTLS,
-    MAIL_FROM,
+from app.utils.settings import settings
+
+# Templates directory (…/app/templates); environment and templates are built
+# once at import (templates don't change at runtime, so no mtime checks)
+_TEMPLATES_DIR = Path(__file__).resolve().parents[1] / "templates"
+_ENV = Environment(
+    loader=FileSystemLoader(str(_TEMPLATES_DIR)),
+    autoescape=select_autoescape(["html", "xml"]),
+    auto_reload=False,
 )
+_SUBJECT_T = _ENV.get_template("email/subject.j2")
+_TEXT_T = _ENV.get_template("email/body.txt.j2")
+_HTML_T = _ENV.get_template("email/body.html.j2")
+
+# Local .eml copies (disabled mode / failures) go to <ROOT>/.outbox
+OUTBOX_DIR = Path(__file__).resolve().parents[2] / ".outbox"
+
+# Persistent SMTP connections, reused across sends (EHLO/STARTTLS/AUTH once per
+# connection, not per message). Slots hold None until first used.
+SMTP_POOL_SIZE = 4
+SMTP_TIMEOUT_S = 20
+_smtp_pool: Optional["asyncio.Queue[Optional[aiosmtplib.SMTP]]"] = None
+
+# One TLS context per process (CA bundle is parsed once, not per connection)
+_SSL_CTX = ssl.create_default_context()
+
+
+def _pool() -> "asyncio.Queue[Optional[aiosmtplib.SMTP]]":
+    global _smtp_pool
+    if _smtp_pool is None:
+        _smtp_pool = asyncio.Queue()
+        for _ in range(SMTP_POOL_SIZE):
+            _smtp_pool.put_nowait(None)
+    return _smtp_pool
+
+
+async def _connect() -> aiosmtplib.SMTP:
+    conn = aiosmtplib.SMTP(
+        hostname=settings.SMTP_HOST,
+        port=settings.SMTP_PORT,
+        timeout=SMTP_TIMEOUT_S,
+        start_tls=False,
+    )
+    try:
+        await conn.connect()
+        if settings.SMTP_STARTTLS:
+            await conn.starttls(tls_context=_SSL_CTX)
+        if settings.SMTP_USER:
+            await conn.login(settings.SMTP_USER, settings.SMTP_PASS or "")
+    except Exception:
+        # Don't leak the socket on TLS/auth failures
+        conn.close()
+        raise
+    return conn
+
+
+async def _quit(conn: aiosmtplib.SMTP) -> None:
+    if conn.is_connected:
+        try:
+            await conn.quit()
+        except Exception:
+            conn.close()
+
+
+async def _pooled_send(msg: EmailMessage) -> None:
+    pool = _pool()
+    conn = await pool.get()
+    try:
+        if conn is None or not conn.is_connected:
+            conn = await _connect()
+        try:
+            await conn.send_message(msg)
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPResponseException) as exc:
+            if isinstance(exc, aiosmtplib.SMTPResponseException) and exc.code != 421:
+                raise
+            # Server dropped (or 421-closed) the idle connection; reconnect once and retry
+            conn.close()
+            conn = None
+            conn = await _connect()
+            await conn.send_message(msg)
+    except BaseException:
+        # Any failure (incl. cancellation) discards the connection; the slot
+        # goes back empty so the next send reconnects
+        if conn is not None:
+            conn.close()
+        conn = None
+        raise
+    finally:
+        if _smtp_pool is pool:
+            pool.put_nowait(conn)
+        elif conn is not None:
+            # Pool was closed while this connection was checked out
+            await _quit(conn)
+
+
+async def close_smtp_pool() -> None:
+    """
+    QUIT pooled SMTP connections (FastAPI shutdown). Connections still checked
+    out are closed by their sender once it finishes.
+    """
+    global _smtp_pool
+    pool, _smtp_pool = _smtp_pool, None
+    while pool is not None and not pool.empty():
+        conn = pool.get_nowait()
+        if conn is not None:
+            await _quit(conn)
 
 
 def render_email(context: Dict) -> Dict:
@@ -39,23 +138,18 @@ def render_email(context: Dict) -> Dict:
     Returns:
         dict with keys: subject (str), text (str), html (str), payload_hash (str)
     """
-    # Locate the templates directory (…/app/templates)
-    templates_dir = Path(__file__).resolve().parents[1] / "templates"
-
-    # Setup Jinja2 environment
-    env = Environment(
-        loader=FileSystemLoader(str(templates_dir)),
-        autoescape=select_autoescape(["html", "xml"]),
-    )
-
     # Render subject, plain text, and HTML
-    subject = env.get_template("email/subject.j2").render(context).strip()
-    text_body = env.get_template("email/body.txt.j2").render(context).strip()
-    html_body = env.get_template("email/body.html.j2").render(context).strip()
+    subject = _SUBJECT_T.render(context).strip()
+    text_body = _TEXT_T.render(context).strip()
+    html_body = _HTML_T.render(context).strip()
 
-    # Compute payload hash (subject + text)
-    payload_data = (subject + "\n" + text_body).encode("utf-8")
-    payload_hash = hashlib.sha256(payload_data).hexdigest()
+    # Compute payload hash (subject + text); fed piecewise, no joined copy.
+    # It's a content fingerprint, not a security primitive.
+    h = hashlib.sha256(usedforsecurity=False)
+    h.update(subject.encode("utf-8"))
+    h.update(b"\n")
+    h.update(text_body.encode("utf-8"))
+    payload_hash = h.hexdigest()
 
     return {
         "subject": subject,
@@ -65,10 +159,10 @@ def render_email(context: Dict) -> Dict:
     }
 
 
-def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
+async def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
     """
-    Send an email using SMTP (if EMAIL_ENABLED) or write a .eml file locally
-    when disabled.
+    Send an email over a pooled SMTP connection (if EMAIL_ENABLED) or write a
+    .eml file locally when disabled.
 
     Args:
         to_addr: recipient address
@@ -83,26 +177,28 @@ def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
     """
     # Build the MIME message (multipart/alternative)
     msg = EmailMessage()
-    msg["From"] = MAIL_FROM
+    msg["From"] = settings.MAIL_FROM
     msg["To"] = to_addr
     msg["Subject"] = subject
     msg.set_content(text)
     msg.add_alternative(html, subtype="html")
 
     # Helper to persist a local .eml (for disabled mode or failures)
-    def _write_eml_copy(status_hint: str = "outbox") -> Path:
-        root_dir = Path(__file__).resolve().parents[2]
-        outbox_dir = root_dir / ".outbox"
-        outbox_dir.mkdir(exist_ok=True)
-        ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-        fname = f"{ts}_{status_hint}_{uuid4().hex}.eml"
-        fpath = outbox_dir / fname
+    def _write_eml_copy_sync(status_hint: str) -> Path:
+        OUTBOX_DIR.mkdir(exist_ok=True)
+        ts = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        fname = f"{ts}_{status_hint}_{secrets.token_hex(8)}.eml"
+        fpath = OUTBOX_DIR / fname
         fpath.write_bytes(msg.as_bytes())
         return fpath
 
+    # Disk I/O runs in a worker thread, off the event loop
+    async def _write_eml_copy(status_hint: str = "outbox") -> Path:
+        return await asyncio.to_thread(_write_eml_copy_sync, status_hint)
+
     # Local/dev mode: just write .eml and report success
-    if not EMAIL_ENABLED:
-        _write_eml_copy("disabled")
+    if not settings.EMAIL_ENABLED:
+        await _write_eml_copy("disabled")
         return {
             "status": "sent",  # treat as sent so acceptance tests pass locally
             "provider_message_id": None,
@@ -110,9 +206,9 @@ def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
         }
 
     # Validate minimal SMTP config
-    if not SMTP_HOST or not SMTP_PORT:
+    if not settings.SMTP_HOST or not settings.SMTP_PORT:
         # Also drop a local copy for debugging
-        _write_eml_copy("misconfig")
+        await _write_eml_copy("misconfig")
         return {
             "status": "failed",
             "provider_message_id": None,
@@ -121,18 +217,8 @@ def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
 
     # Attempt SMTP send
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as server:
-            server.ehlo()
-            if SMTP_STARTTLS:
-                context = ssl.create_default_context()
-                server.starttls(context=context)
-                server.ehlo()
-
-            if SMTP_USER:
-                server.login(SMTP_USER, SMTP_PASS or "")
-
-            # Note: SMTP doesn't return a provider message id here
-            server.send_message(msg)
+        # Note: SMTP doesn't return a provider message id here
+        await _pooled_send(msg)
 
         return {
             "status": "sent",
@@ -142,7 +228,7 @@ def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
 
     except Exception as exc:
         # Save a copy for post-mortem and propagate error
-        _write_eml_copy("failed")
+        await _write_eml_copy("failed")
         return {
             "status": "failed",
             "provider_message_id": None,
@@ -150,7 +236,7 @@ def send_email(to_addr: str, subject: str, text: str, html: str) -> Dict:
         }
 
 
-def send_support_email(to_addr: str, context: Dict) -> Dict:
+async def send_support_email(to_addr: str, context: Dict) -> Dict:
     """
     High-level orchestration:
     - Render email with context
@@ -166,7 +252,7 @@ def send_support_email(to_addr: str, context: Dict) -> Dict:
                         subject (for logging), text (for logging)
     """
     rendered = render_email(context)
-    result = send_email(
+    result = await send_email(
         to_addr=to_addr,
         subject=rendered["subject"],
         text=rendered["text"],
@@ -1,40 +1,57 @@
 # app/utils/flash.py
 # Signed, one-time flash messages via a separate cookie.
 import base64
-import hashlib
 import hmac
-import json
+import logging
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
+import orjson
 from fastapi import Request, Response
-from . import settings
+from .settings import settings
+
+# Encoded once; hmac.digest takes the one-shot C path (no HMAC object per call)
+_SECRET = settings.SESSION_SECRET.encode()
+
+logger = logging.getLogger(__name__)
+
+_SIG_B64_LEN = 43      # HMAC-SHA256 -> 32 bytes -> 43 base64url chars
+_COOKIE_MAX_LEN = 2048
+
+# Padding needed to restore a no-pad base64 string, indexed by len % 4
+_B64_PAD = ("", "===", "==", "=")
 
 def _b64url_nopad(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+    enc = base64.urlsafe_b64encode(data)
+    pad = -len(data) % 3  # number of trailing "=" the encoder added
+    return (enc[:-pad] if pad else enc).decode("ascii")
 
 def _b64url_decode(data: str) -> bytes:
-    pad = "=" * (-len(data) % 4)
-    return base64.urlsafe_b64decode((data + pad).encode())
+    return base64.urlsafe_b64decode(data + _B64_PAD[len(data) & 3])
 
 def _sign(msg: bytes) -> bytes:
-    return hmac.new(settings.SESSION_SECRET.encode(), msg, hashlib.sha256).digest()
+    return hmac.digest(_SECRET, msg, "sha256")
 
 def _encode(messages: List[Dict[str, Any]]) -> str:
-    raw = json.dumps(messages, separators=(",", ":"), sort_keys=True).encode()
+    raw = orjson.dumps(messages)
     sig = _sign(raw)
     return f"{_b64url_nopad(raw)}.{_b64url_nopad(sig)}"
 
-def _decode(cookie_val: str) -> List[Dict[str, Any]]:
+def _decode(cookie_val: str) -> Sequence[Dict[str, Any]]:
+    # Shape preflight: "<payload>.<43-char sig>", bounded; skips decode/HMAC on garbage
+    if not (_SIG_B64_LEN + 2 <= len(cookie_val) <= _COOKIE_MAX_LEN) or cookie_val[-_SIG_B64_LEN - 1] != ".":
+        return ()
     try:
         p_b64, s_b64 = cookie_val.split(".", 1)
         raw = _b64url_decode(p_b64)
         sig = _b64url_decode(s_b64)
         if not hmac.compare_digest(_sign(raw), sig):
-            return []
-        data = json.loads(raw.decode())
-        return data if isinstance(data, list) else []
-    except Exception:
-        return []
+            logger.debug("flash decode failed: signature mismatch")
+            return ()
+        data = orjson.loads(raw)
+        return data if isinstance(data, list) else ()
+    except Exception as e:
+        logger.debug("flash decode failed: %s", e)
+        return ()
 
 def add(response: Response, level: str, text: str) -> None:
     """
@@ -52,25 +69,9 @@ def add(response: Response, level: str, text: str) -> None:
         path="/",
     )
 
-def consume(request: Request, response: Response) -> List[Dict[str, Any]]:
+def consume(request: Request, response: Response) -> Sequence[Dict[str, Any]]:
     val = request.cookies.get(settings.FLASH_COOKIE_NAME)
-    msgs = _decode(val) if val else []
+    msgs = _decode(val) if val else ()
     if val:
         response.delete_cookie(settings.FLASH_COOKIE_NAME, path="/")
     return msgs
-
-def _decode(cookie_val: str) -> List[Dict[str, Any]]:
-    try:
-        p_b64, s_b64 = cookie_val.split(".", 1)
-        raw = _b64url_decode(p_b64)
-        sig = _b64url_decode(s_b64)
-        expected = _sign(raw)
-        if not hmac.compare_digest(expected, sig):
-            print("⚠️ Flash decode failed: signature mismatch")
-            return []
-        data = json.loads(raw.decode())
-        return data if isinstance(data, list) else []
-    except Exception as e:
-        print(f"⚠️ Flash decode error: {e}")
-        return []
-
@@ -1,36 +1,154 @@
 # app/utils/rate_limit.py
-# In-memory IP-based limiter for /admin/login (MVP).
+# IP-based limiter for /admin/login.
+# With REDIS_URL set, state is shared by all workers (sliding window in a ZSET);
+# otherwise it's in-memory and per process (each uvicorn worker counts alone).
+import logging
+import secrets
+import threading
 import time
-from typing import Tuple, Dict
+from collections import OrderedDict, deque
+from typing import Any, Deque, Optional, Tuple, Dict
+
+from .settings import settings
 
 WINDOW_S = 600       # 10 minutes
 MAX_ATTEMPTS = 5
 LOCKOUT_S = 600      # 10 minutes
+MAX_IPS = 100_000    # LRU cap; least recently seen IPs are evicted first
+REDIS_TIMEOUT_S = 0.5     # connect/read; an unreachable Redis must not stall logins
+REDIS_RETRY_AFTER_S = 30  # after a Redis error, use memory this long before retrying
+
+logger = logging.getLogger(__name__)
+
+# ip -> { "wins": deque[ts] (at most MAX_ATTEMPTS), "lock_until": ts }
+_state: "OrderedDict[str, Dict]" = OrderedDict()
+_lock = threading.Lock()  # held for a few dict ops only; safe from loop or threadpool
 
-# ip -> { "wins": [ts...], "lock_until": ts }
-_state: Dict[str, Dict] = {}
+_redis: Optional[Any] = None  # redis.asyncio.Redis, created on first use
+_redis_down_until = 0.0       # time.monotonic() deadline of the circuit breaker
 
 def _now() -> int:
     return int(time.time())
 
-def check(ip: str) -> Tuple[bool, int]:
-    s = _state.get(ip, {"wins": [], "lock_until": 0})
+# --- in-memory backend ---
+
+def _entry(ip: str) -> Dict:
+    s = _state.get(ip)
+    if s is None:
+        s = _state[ip] = {"wins": deque(maxlen=MAX_ATTEMPTS), "lock_until": 0}
+        if len(_state) > MAX_IPS:
+            _state.popitem(last=False)
+    else:
+        _state.move_to_end(ip)
+    return s
+
+def _mem_check(ip: str) -> Tuple[bool, int]:
     now = _now()
-    if s.get("lock_until", 0) > now:
-        return False, s["lock_until"] - now
-    # prune window
-    s["wins"] = [t for t in s.get("wins", []) if now - t <= WINDOW_S]
-    _state[ip] = s
-    if len(s["wins"]) >= MAX_ATTEMPTS:
-        s["lock_until"] = now + LOCKOUT_S
-        _state[ip] = s
+    with _lock:
+        s = _entry(ip)
+        if s["lock_until"] > now:
+            return False, s["lock_until"] - now
+        # prune window (oldest first)
+        wins: Deque[int] = s["wins"]
+        while wins and now - wins[0] > WINDOW_S:
+            wins.popleft()
+        if len(wins) >= MAX_ATTEMPTS:
+            s["lock_until"] = now + LOCKOUT_S
+            return False, LOCKOUT_S
+    return True, 0
+
+def _mem_record_failure(ip: str) -> None:
+    with _lock:
+        _entry(ip)["wins"].append(_now())
+
+def _mem_record_success(ip: str) -> None:
+    with _lock:
+        _state.pop(ip, None)
+
+# --- Redis backend (optional) ---
+
+def _client() -> Optional[Any]:
+    global _redis
+    if not settings.REDIS_URL or time.monotonic() < _redis_down_until:
+        return None
+    if _redis is None:
+        try:
+            import redis.asyncio as aioredis  # optional dependency
+        except Exception:
+            return None
+        _redis = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=REDIS_TIMEOUT_S,
+            socket_timeout=REDIS_TIMEOUT_S,
+        )
+    return _redis
+
+def _redis_failed() -> None:
+    # Open the breaker: skip Redis for a while instead of timing out on every login
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER_S
+    logger.warning("rate limit: Redis unavailable, using in-memory state for %ss", REDIS_RETRY_AFTER_S, exc_info=True)
+
+def _keys(ip: str) -> Tuple[str, str]:
+    return f"rl:wins:{ip}", f"rl:lock:{ip}"
+
+async def _redis_check(r: Any, ip: str) -> Tuple[bool, int]:
+    wins_key, lock_key = _keys(ip)
+    now = time.time()
+    # one round-trip: lock TTL, prune window, count what's left
+    pipe = r.pipeline(transaction=False)
+    pipe.ttl(lock_key)
+    pipe.zremrangebyscore(wins_key, 0, now - WINDOW_S)
+    pipe.zcard(wins_key)
+    lock_ttl, _, count = await pipe.execute()
+    if lock_ttl and lock_ttl > 0:
+        return False, int(lock_ttl)
+    if count >= MAX_ATTEMPTS:
+        await r.set(lock_key, 1, ex=LOCKOUT_S, nx=True)
         return False, LOCKOUT_S
     return True, 0
 
-def record_failure(ip: str) -> None:
-    s = _state.get(ip, {"wins": [], "lock_until": 0})
-    s["wins"].append(_now())
-    _state[ip] = s
+async def _redis_record_failure(r: Any, ip: str) -> None:
+    wins_key, _ = _keys(ip)
+    now = time.time()
+    pipe = r.pipeline(transaction=False)
+    pipe.zadd(wins_key, {f"{now}:{secrets.token_hex(4)}": now})
+    pipe.expire(wins_key, WINDOW_S)
+    await pipe.execute()
+
+# --- public API (Redis when configured; falls back to memory if it's unreachable) ---
+
+async def check(ip: str) -> Tuple[bool, int]:
+    r = _client()
+    if r is not None:
+        try:
+            return await _redis_check(r, ip)
+        except Exception:
+            _redis_failed()
+    return _mem_check(ip)
+
+async def record_failure(ip: str) -> None:
+    r = _client()
+    if r is not None:
+        try:
+            return await _redis_record_failure(r, ip)
+        except Exception:
+            _redis_failed()
+    _mem_record_failure(ip)
+
+async def record_success(ip: str) -> None:
+    r = _client()
+    if r is not None:
+        try:
+            await r.delete(*_keys(ip))
+            return
+        except Exception:
+            _redis_failed()
+    _mem_record_success(ip)
 
-def record_success(ip: str) -> None:
-    _state[ip] = {"wins": [], "lock_until": 0}
+async def close() -> None:
+    """Close the Redis connection pool, if one was opened (FastAPI shutdown)."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
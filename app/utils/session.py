@@ -1,26 +1,50 @@
 # app/utils/session.py
 # Signed-cookie session: payload.sign with HMAC-SHA256 (base64url without padding).
 import base64
-import hashlib
 import hmac
-import json
+import threading
 import time
 import secrets
 
-from typing import Optional, Tuple, Dict, Any
-from . import settings
+from types import MappingProxyType
+from typing import Optional, Tuple, Dict, Any, Mapping
+import orjson
+from .settings import settings
+
+_COOKIE_NAME = settings.SESSION_COOKIE_NAME
+
+# Encoded once; hmac.digest takes the one-shot C path (no HMAC object per call)
+_SECRET = settings.SESSION_SECRET.encode()
 
 _B64ALT = b"-_"
 
+# cookie -> (payload, valid_until): memo of already-verified cookies so repeat
+# requests skip base64 + HMAC + JSON. Entries never outlive the session itself.
+# Payloads are read-only views, so no caller can alter a shared session.
+_VERIFIED_MAX = 10_000
+_VERIFIED_TTL_S = 60
+_verified: Dict[str, Tuple[Mapping[str, Any], int]] = {}
+_verified_lock = threading.Lock()  # guards eviction (guard runs in the threadpool too)
+
+# Cookie shape bounds: signature is 32 bytes -> 43 base64url chars; the smallest
+# real payload (admin_id + 43-char csrf + issued_at) alone encodes to ~100.
+_SIG_B64_LEN = 43
+_COOKIE_MIN_LEN = 80
+_COOKIE_MAX_LEN = 2048
+
+# Padding needed to restore a no-pad base64 string, indexed by len % 4
+_B64_PAD = ("", "===", "==", "=")
+
 def _b64url_nopad(data: bytes) -> str:
-    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+    enc = base64.urlsafe_b64encode(data)
+    pad = -len(data) % 3  # number of trailing "=" the encoder added
+    return (enc[:-pad] if pad else enc).decode("ascii")
 
 def _b64url_decode(data: str) -> bytes:
-    pad = "=" * (-len(data) % 4)
-    return base64.urlsafe_b64decode((data + pad).encode())
+    return base64.urlsafe_b64decode(data + _B64_PAD[len(data) & 3])
 
 def _sign(msg: bytes) -> bytes:
-    return hmac.new(settings.SESSION_SECRET.encode(), msg, hashlib.sha256).digest()
+    return hmac.digest(_SECRET, msg, "sha256")
 
 def _ct_eq(a: bytes, b: bytes) -> bool:
     return hmac.compare_digest(a, b)
@@ -32,18 +56,39 @@ def _max_age_s() -> int:
     return settings.SESSION_MAX_AGE_MIN * 60
 
 def issue_session(admin_id: str) -> str:
+    # Fixed key order; rotate_csrf copies it, so output stays canonical without sort_keys
     payload = {
         "admin_id": admin_id,
         "csrf": secrets.token_urlsafe(32),
         "issued_at": _now(),
     }
-    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    raw = orjson.dumps(payload)
     sig = _sign(raw)
     return f"{_b64url_nopad(raw)}.{_b64url_nopad(sig)}"
 
-def verify_session(cookie_value: Optional[str]) -> Optional[Dict[str, Any]]:
-    if not cookie_value or "." not in cookie_value:
+def _memo_put(cookie_value: str, payload: Mapping[str, Any], valid_until: int) -> None:
+    with _verified_lock:
+        if len(_verified) >= _VERIFIED_MAX:
+            # Full: drop expired entries first, then the oldest (insertion order)
+            now = _now()
+            for k in [k for k, (_, until) in _verified.items() if until <= now]:
+                del _verified[k]
+            while len(_verified) >= _VERIFIED_MAX:
+                del _verified[next(iter(_verified))]
+        _verified[cookie_value] = (payload, valid_until)
+
+def verify_session(cookie_value: Optional[str]) -> Optional[Mapping[str, Any]]:
+    # Shape preflight: "<payload>.<43-char sig>" within sane bounds; garbage is
+    # rejected before any base64/HMAC/JSON work
+    if (
+        not cookie_value
+        or not (_COOKIE_MIN_LEN <= len(cookie_value) <= _COOKIE_MAX_LEN)
+        or cookie_value[-_SIG_B64_LEN - 1] != "."
+    ):
         return None
+    hit = _verified.get(cookie_value)
+    if hit and hit[1] > _now():
+        return hit[0]
     p_b64, s_b64 = cookie_value.split(".", 1)
     try:
         raw = _b64url_decode(p_b64)
@@ -53,7 +98,7 @@ def verify_session(cookie_value: Optional[str]) -> Optional[Dict[str, Any]]:
     if not _ct_eq(_sign(raw), sig):
         return None
     try:
-        payload = json.loads(raw.decode())
+        payload = orjson.loads(raw)
     except Exception:
         return None
     if not isinstance(payload, dict):
@@ -64,14 +109,34 @@ def verify_session(cookie_value: Optional[str]) -> Optional[Dict[str, Any]]:
     # minimal shape check
     if not payload.get("admin_id") or not payload.get("csrf"):
         return None
-    return payload
+    view = MappingProxyType(payload)
+    _memo_put(cookie_value, view, min(_now() + _VERIFIED_TTL_S, issued + _max_age_s()))
+    return view
+
+def session_from_request(request: Any) -> Optional[Mapping[str, Any]]:
+    """
+    Verified session payload for this request (None if absent/invalid).
+    Verified once and kept on request.state for the guard, CSRF check and templates.
+    """
+    state = request.state
+    try:
+        return state.admin_session
+    except AttributeError:
+        payload = verify_session(request.cookies.get(_COOKIE_NAME))
+        state.admin_session = payload
+        return payload
+
+def forget_session(cookie_value: Optional[str]) -> None:
+    """Drop a cookie from the verified-session memo (logout)."""
+    if cookie_value:
+        _verified.pop(cookie_value, None)
 
 def encode_cookie(payload: Dict[str, Any]) -> str:
-    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    raw = orjson.dumps(payload)
     sig = _sign(raw)
     return f"{_b64url_nopad(raw)}.{_b64url_nopad(sig)}"
 
-def rotate_csrf(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+def rotate_csrf(payload: Mapping[str, Any]) -> Tuple[Dict[str, Any], str]:
     payload = dict(payload)
     payload["csrf"] = secrets.token_urlsafe(32)
     payload["issued_at"] = _now()  # refresh issue time on rotation
@@ -79,7 +144,7 @@ def rotate_csrf(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
 
 def cookie_params() -> Dict[str, Any]:
     return {
-        "key": settings.SESSION_COOKIE_NAME,
+        "key": _COOKIE_NAME,
         "httponly": True,
         "secure": settings.COOKIE_SECURE,
         "samesite": settings.COOKIE_SAMESITE,
@@ -89,7 +154,7 @@ def cookie_params() -> Dict[str, Any]:
 
 def clear_cookie_params() -> Dict[str, Any]:
     return {
-        "key": settings.SESSION_COOKIE_NAME,
+        "key": _COOKIE_NAME,
         "max_age": 0,
         "path": "/",
     }
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-import os
 from pathlib import Path
+from typing import Any, Optional
+
+from dotenv import find_dotenv
+from pydantic import ValidationInfo, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # --- Locate project root and .env ---
 # utils/settings.py → parents = [utils, app, <ROOT>]
@@ -9,73 +13,76 @@ ROOT_DIR = Path(__file__).resolve().parents[2]
 ENV_PATH = ROOT_DIR / ".env"
 
 
-# --- Load environment variables ---
-def _load_env() -> None:
-    """
-    Load environment variables from .env if possible.
-    1. Try python-dotenv if available.
-    2. Fallback: tiny manual parser.
-    """
-    try:
-        from dotenv import load_dotenv, find_dotenv  # type: ignore
-
-        if ENV_PATH.exists():
-            load_dotenv(dotenv_path=ENV_PATH, override=False)
-        else:
-            # Try auto-discovery from current working directory
-            dotenv_path = find_dotenv(usecwd=True)
-            if dotenv_path:
-                load_dotenv(dotenv_path=dotenv_path, override=False)
-    except Exception:
-        # Fallback manual parser
-        if ENV_PATH.exists():
-            for line in ENV_PATH.read_text(encoding="utf-8").splitlines():
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                k, v = line.split("=", 1)
-                os.environ.setdefault(k.strip(), v.strip())
-
-
-_load_env()
-
-
-# --- Helper to fetch env vars ---
-def _env(name: str, default: str | None = None, *, required: bool = False) -> str:
+def _env_file() -> Optional[Path]:
+    # <ROOT>/.env, else auto-discovery from the current working directory
+    if ENV_PATH.exists():
+        return ENV_PATH
+    found = find_dotenv(usecwd=True)
+    return Path(found) if found else None
+
+
+_TRUTHY = {"1", "true", "yes", "y"}
+
+
+class Settings(BaseSettings):
     """
-    Read environment variable, with optional default or required flag.
+    Application settings, parsed and validated once per process from the
+    environment and .env (<ROOT>/.env, else one found from the working
+    directory; real env vars take precedence). Empty values count as unset,
+    so required fields must be non-empty. Flags are true for 1/true/yes/y
+    (any case) and false for anything else.
     """
-    val = os.getenv(name, default)
-    if required and (val is None or val.strip() == ""):
-        raise RuntimeError(f"Missing required environment variable: {name}")
-    return val or ""
-
-
-# --- Application settings ---
-ADMIN_USER: str = _env("ADMIN_USER", required=True)
-ADMIN_PASS_HASH: str = _env("ADMIN_PASS_HASH", required=True)
-SECRET_KEY: str = _env("SECRET_KEY", required=True)
-
-# Database
-DATABASE_URL: str = _env("DATABASE_URL", "sqlite:///dev.db")
-
-# Optional knobs with safe defaults
-APP_TITLE: str = _env("APP_TITLE", "QR Support")
-DEBUG: bool = _env("DEBUG", "false").lower() in {"1", "true", "yes", "y"}
-
-# Cookie/security knobs
-COOKIE_SECURE: bool = _env("COOKIE_SECURE", "false").lower() in {"1", "true", "yes"}
-COOKIE_SAMESITE: str = _env("COOKIE_SAMESITE", "lax")
-SESSION_SECRET: str = _env("SESSION_SECRET", SECRET_KEY)  # fallback to SECRET_KEY
-SESSION_COOKIE_NAME: str = _env("SESSION_COOKIE_NAME", "qr_session")
-FLASH_COOKIE_NAME: str = _env("FLASH_COOKIE_NAME", "qr_flash")
-SESSION_MAX_AGE_MIN: int = int(_env("SESSION_MAX_AGE_MIN", "60"))
-
-# --- Email (Phase 5) ---
-EMAIL_ENABLED: bool = _env("EMAIL_ENABLED", "false").lower() in {"1", "true", "yes", "y"}
-SMTP_HOST: str = _env("SMTP_HOST", "")
-SMTP_PORT: int = int(_env("SMTP_PORT", "587"))
-SMTP_USER: str = _env("SMTP_USER", "")
-SMTP_PASS: str = _env("SMTP_PASS", "")
-SMTP_STARTTLS: bool = _env("SMTP_STARTTLS", "true").lower() in {"1", "true", "yes", "y"}
-MAIL_FROM: str = _env("MAIL_FROM", "Support <support@example.com>")
+
+    model_config = SettingsConfigDict(
+        env_file=_env_file(),
+        env_file_encoding="utf-8",
+        env_ignore_empty=True,
+        extra="ignore",
+        frozen=True,
+    )
+
+    # --- Application settings ---
+    ADMIN_USER: str
+    ADMIN_PASS_HASH: str
+    SECRET_KEY: str
+
+    # Database
+    DATABASE_URL: str = "sqlite:///dev.db"
+
+    # Optional knobs with safe defaults
+    APP_TITLE: str = "QR Support"
+    DEBUG: bool = False
+
+    # Cookie/security knobs
+    COOKIE_SECURE: bool = False
+    COOKIE_SAMESITE: str = "lax"
+    SESSION_SECRET: str = ""  # fallback to SECRET_KEY
+    SESSION_COOKIE_NAME: str = "qr_session"
+    FLASH_COOKIE_NAME: str = "qr_flash"
+    SESSION_MAX_AGE_MIN: int = 60
+
+    # Shared login rate-limit state across workers (empty = in-memory, per process)
+    REDIS_URL: str = ""
+
+    # --- Email (Phase 5) ---
+    EMAIL_ENABLED: bool = False
+    SMTP_HOST: str = ""
+    SMTP_PORT: int = 587
+    SMTP_USER: str = ""
+    SMTP_PASS: str = ""
+    SMTP_STARTTLS: bool = True
+    MAIL_FROM: str = "Support <support@example.com>"
+
+    @field_validator("DEBUG", "COOKIE_SECURE", "EMAIL_ENABLED", "SMTP_STARTTLS", mode="before")
+    @classmethod
+    def _lenient_flag(cls, v: Any) -> Any:
+        # Unrecognised strings mean False rather than a startup ValidationError
+        return v.strip().lower() in _TRUTHY if isinstance(v, str) else v
+
+    @field_validator("SESSION_SECRET", mode="after")
+    @classmethod
+    def _session_secret_fallback(cls, v: str, info: ValidationInfo) -> str:
+        return v or info.data.get("SECRET_KEY", "")
+
+
+settings = Settings()
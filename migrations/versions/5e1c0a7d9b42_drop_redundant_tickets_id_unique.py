@@ -0,0 +1,31 @@
+"""drop redundant unique constraint on tickets.id
+
+Revision ID: 5e1c0a7d9b42
+Revises: bc92861fb37d
+Create Date: 2026-10-14 18:20:11.402318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e1c0a7d9b42"
+down_revision: Union[str, Sequence[str], None] = "bc92861fb37d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # tickets.id is the primary key; the extra unique index only doubled writes
+    with op.batch_alter_table("tickets") as batch_op:
+        batch_op.drop_constraint("uq_tickets_id", type_="unique")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("tickets") as batch_op:
+        batch_op.create_unique_constraint("uq_tickets_id", ["id"])
@@ -0,0 +1,32 @@
+"""add ticket and audit event indexes
+
+Revision ID: bc92861fb37d
+Revises: 40337e53cf25
+Create Date: 2026-10-14 18:12:29.878747
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "bc92861fb37d"
+down_revision: Union[str, Sequence[str], None] = "40337e53cf25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_audit_events_created_at", "audit_events", ["created_at"], unique=False)
+    op.create_index("ix_audit_events_entity", "audit_events", ["entity_type", "entity_id"], unique=False)
+    op.create_index("ix_tickets_status_created", "tickets", ["status", "created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tickets_status_created", table_name="tickets")
+    op.drop_index("ix_audit_events_entity", table_name="audit_events")
+    op.drop_index("ix_audit_events_created_at", table_name="audit_events")
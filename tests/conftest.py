@@ -0,0 +1,25 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Settings are read once at import, so the test environment must be in place
+# before anything under app/ is imported.
+_TMP = Path(tempfile.mkdtemp(prefix="qr-support-tests-"))
+os.environ.setdefault("ADMIN_USER", "admin@example.com")
+os.environ.setdefault("ADMIN_PASS_HASH", "$2b$04$invalidinvalidinvalidinvalidinvalidinvalidinvalidinv")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("SESSION_SECRET", "test-session-secret")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["EMAIL_ENABLED"] = "false"
+os.environ["REDIS_URL"] = ""
+
+import pytest  # noqa: E402
+
+from app.database import Base, engine  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _schema():
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
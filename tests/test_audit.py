@@ -0,0 +1,36 @@
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import AuditEvent
+from app.utils import audit
+
+
+def _actions(prefix: str) -> list:
+    with SessionLocal() as db:
+        rows = db.scalars(select(AuditEvent.action).where(AuditEvent.action.like(f"{prefix}%")))
+        return list(rows)
+
+
+def test_stop_drains_queued_events():
+    audit.start()
+    try:
+        for i in range(25):
+            audit.record("tester", f"drain.{i}", "test", i)
+    finally:
+        audit.stop()
+    assert len(_actions("drain.")) == 25
+    assert audit._queue.empty()
+
+
+def test_record_without_writer_is_written_synchronously():
+    assert audit._thread is None
+    audit.record("tester", "sync.one", "test")
+    assert _actions("sync.") == ["sync.one"]
+    assert audit._queue.empty()
+
+
+def test_bad_row_does_not_drop_the_batch():
+    good = {"actor": "tester", "action": "batch.ok", "entity_type": "test", "meta": None}
+    bad = dict(good, action="batch.bad", meta=object())  # not JSON-serializable
+    audit._flush([good, bad, dict(good)])
+    assert _actions("batch.") == ["batch.ok", "batch.ok"]
@@ -0,0 +1,105 @@
+import asyncio
+from email.message import EmailMessage
+
+import aiosmtplib
+import pytest
+
+from app.utils import emailer
+
+
+class _FakeSMTP:
+    """Minimal aiosmtplib.SMTP stand-in; `fail` is raised on the next send."""
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.is_connected = True
+        self.sent = 0
+        self.closed = False
+
+    async def send_message(self, msg):
+        if self.fail is not None:
+            exc, self.fail = self.fail, None
+            raise exc
+        self.sent += 1
+
+    def close(self):
+        self.closed = True
+        self.is_connected = False
+
+    async def quit(self):
+        self.close()
+
+
+@pytest.fixture
+def connects(monkeypatch):
+    """Queue of connections _connect() hands out; records how many were made."""
+    made = []
+
+    async def fake_connect():
+        conn = made_next.pop(0) if made_next else _FakeSMTP()
+        made.append(conn)
+        return conn
+
+    made_next = []
+    monkeypatch.setattr(emailer, "_connect", fake_connect)
+    monkeypatch.setattr(emailer, "_smtp_pool", None)
+    yield made, made_next
+    emailer._smtp_pool = None
+
+
+def _msg() -> EmailMessage:
+    msg = EmailMessage()
+    msg["To"] = "support@example.com"
+    msg.set_content("hello")
+    return msg
+
+
+def _pooled(pool) -> list:
+    return [c for c in pool._queue if c is not None]
+
+
+def test_connection_is_reused_between_sends(connects, monkeypatch):
+    monkeypatch.setattr(emailer, "SMTP_POOL_SIZE", 1)  # FIFO pool: one slot -> same connection
+    made, _ = connects
+
+    async def run():
+        await emailer._pooled_send(_msg())
+        await emailer._pooled_send(_msg())
+
+    asyncio.run(run())
+    assert len(made) == 1 and made[0].sent == 2
+
+
+def test_reconnects_after_server_disconnect(connects):
+    made, made_next = connects
+    stale = _FakeSMTP(fail=aiosmtplib.SMTPServerDisconnected("gone"))
+    made_next.append(stale)
+
+    asyncio.run(emailer._pooled_send(_msg()))
+
+    assert len(made) == 2
+    assert stale.closed and stale.sent == 0
+    assert made[1].sent == 1
+    assert _pooled(emailer._smtp_pool) == [made[1]]
+
+
+def test_421_is_treated_as_disconnect(connects):
+    made, made_next = connects
+    made_next.append(_FakeSMTP(fail=aiosmtplib.SMTPResponseException(421, "closing")))
+
+    asyncio.run(emailer._pooled_send(_msg()))
+
+    assert len(made) == 2 and made[1].sent == 1
+
+
+def test_failed_send_discards_the_connection(connects):
+    made, made_next = connects
+    made_next.append(_FakeSMTP(fail=aiosmtplib.SMTPResponseException(550, "rejected")))
+
+    with pytest.raises(aiosmtplib.SMTPResponseException):
+        asyncio.run(emailer._pooled_send(_msg()))
+
+    assert made[0].closed
+    pool = emailer._smtp_pool
+    assert pool.qsize() == emailer.SMTP_POOL_SIZE  # slot returned...
+    assert _pooled(pool) == []                      # ...but empty
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import public
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def test_form_sends_etag_and_private_cache_control(client):
+    r = client.get("/public/form?sn=SN1&type=MT")
+    assert r.status_code == 200
+    assert r.headers["etag"].startswith('"')
+    assert r.headers["cache-control"] == "private, max-age=60"
+
+
+def test_matching_etag_gets_304(client):
+    etag = client.get("/public/form?sn=SN1").headers["etag"]
+    r = client.get("/public/form?sn=SN1", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+
+
+@pytest.mark.parametrize(
+    "header",
+    ['W/{etag}', '"other", {etag}', 'W/"other", W/{etag}', "*"],
+)
+def test_etag_list_weak_and_star_match(client, header):
+    etag = client.get("/public/form?sn=SN2").headers["etag"]
+    r = client.get("/public/form?sn=SN2", headers={"If-None-Match": header.format(etag=etag)})
+    assert r.status_code == 304
+
+
+def test_etag_depends_on_query(client):
+    etag = client.get("/public/form?sn=SN3").headers["etag"]
+    r = client.get("/public/form?sn=SN4", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_etag_follows_template_changes_in_debug(monkeypatch):
+    before = public._form_etag("sn=1")
+    monkeypatch.setattr(public, "settings", type("S", (), {"DEBUG": True})())
+    monkeypatch.setattr(public, "_templates_digest", lambda names: b"edited-template-src")
+    assert public._form_etag("sn=1") != before
+
+
+def test_etag_matches_helper():
+    assert not public._etag_matches(None, '"a"')
+    assert not public._etag_matches('"b"', '"a"')
+    assert public._etag_matches(' "b" , W/"a"', '"a"')
+
+
+def test_ping(client):
+    r = client.get("/public/ping")
+    assert r.headers["content-type"] == "application/json"
+    assert r.json() == {"pong": True}
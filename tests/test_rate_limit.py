@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.utils import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def _reset(monkeypatch):
+    rate_limit._state.clear()
+    monkeypatch.setattr(rate_limit, "_redis", None)
+    monkeypatch.setattr(rate_limit, "_redis_down_until", 0.0)
+    yield
+    rate_limit._state.clear()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_memory_lockout_after_max_attempts():
+    ip = "203.0.113.7"
+    for _ in range(rate_limit.MAX_ATTEMPTS):
+        assert _run(rate_limit.check(ip)) == (True, 0)
+        _run(rate_limit.record_failure(ip))
+    allowed, retry_after = _run(rate_limit.check(ip))
+    assert not allowed and retry_after == rate_limit.LOCKOUT_S
+    # Still locked on the next check, even though nothing new was recorded
+    assert _run(rate_limit.check(ip))[0] is False
+    _run(rate_limit.record_success(ip))
+    assert _run(rate_limit.check(ip)) == (True, 0)
+
+
+def test_old_failures_leave_the_window(monkeypatch):
+    ip = "203.0.113.8"
+    now = [1_000_000]
+    monkeypatch.setattr(rate_limit, "_now", lambda: now[0])
+    for _ in range(rate_limit.MAX_ATTEMPTS - 1):
+        _run(rate_limit.record_failure(ip))
+    now[0] += rate_limit.WINDOW_S + 1
+    _run(rate_limit.record_failure(ip))
+    assert _run(rate_limit.check(ip)) == (True, 0)
+
+
+def test_state_is_bounded(monkeypatch):
+    monkeypatch.setattr(rate_limit, "MAX_IPS", 3)
+    for i in range(5):
+        _run(rate_limit.record_failure(f"198.51.100.{i}"))
+    assert list(rate_limit._state) == ["198.51.100.2", "198.51.100.3", "198.51.100.4"]
+
+
+class _DeadRedis:
+    """Stands in for redis.asyncio.Redis when the server is unreachable."""
+
+    calls = 0
+
+    def pipeline(self, transaction=False):
+        _DeadRedis.calls += 1
+        raise ConnectionError("redis down")
+
+    async def delete(self, *keys):
+        _DeadRedis.calls += 1
+        raise ConnectionError("redis down")
+
+
+def test_redis_errors_fall_back_to_memory_and_open_breaker(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_client", lambda: None if rate_limit._redis_down_until else _DeadRedis())
+    _DeadRedis.calls = 0
+    ip = "203.0.113.9"
+
+    for _ in range(rate_limit.MAX_ATTEMPTS):
+        assert _run(rate_limit.check(ip)) == (True, 0)
+        _run(rate_limit.record_failure(ip))
+    assert _run(rate_limit.check(ip))[0] is False  # lockout enforced from memory
+
+    # Only the first call reached Redis; the breaker kept the rest local
+    assert _DeadRedis.calls == 1
+    assert rate_limit._redis_down_until > 0
+
+
+def test_breaker_skips_client_until_deadline(monkeypatch):
+    monkeypatch.setattr(rate_limit, "settings", type("S", (), {"REDIS_URL": "redis://unused"})())
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: 100.0)
+    monkeypatch.setattr(rate_limit, "_redis_down_until", 130.0)
+    assert rate_limit._client() is None
@@ -0,0 +1,59 @@
+import pytest
+
+from app.utils import session as sess
+
+
+@pytest.fixture(autouse=True)
+def _clear_memo():
+    sess._verified.clear()
+    yield
+    sess._verified.clear()
+
+
+def test_memo_never_outlives_max_age(monkeypatch):
+    t0 = 1_700_000_000
+    monkeypatch.setattr(sess, "_now", lambda: t0)
+    cookie = sess.issue_session("admin@example.com")
+    assert sess.verify_session(cookie)["admin_id"] == "admin@example.com"
+    assert cookie in sess._verified
+
+    # Session issued 1s before max_age: the memo entry is capped at expiry
+    monkeypatch.setattr(sess, "_now", lambda: t0 + sess._max_age_s() - 1)
+    assert sess.verify_session(cookie) is not None
+    assert sess._verified[cookie][1] <= t0 + sess._max_age_s()
+
+    monkeypatch.setattr(sess, "_now", lambda: t0 + sess._max_age_s() + 1)
+    assert sess.verify_session(cookie) is None
+
+
+def test_memo_hit_is_read_only():
+    cookie = sess.issue_session("admin@example.com")
+    payload = sess.verify_session(cookie)
+    with pytest.raises(TypeError):
+        payload["admin_id"] = "someone-else"
+    assert sess.verify_session(cookie)["admin_id"] == "admin@example.com"
+
+
+def test_full_memo_evicts_expired_then_oldest(monkeypatch):
+    monkeypatch.setattr(sess, "_VERIFIED_MAX", 3)
+    cookies = [sess.issue_session(f"user{i}") for i in range(3)]
+    for c in cookies:
+        sess.verify_session(c)
+    # Expire the middle entry: it goes first, the others stay
+    payload, _ = sess._verified[cookies[1]]
+    sess._verified[cookies[1]] = (payload, 0)
+    sess.verify_session(sess.issue_session("user3"))
+    assert cookies[1] not in sess._verified
+    assert cookies[0] in sess._verified and cookies[2] in sess._verified
+
+    # Nothing expired: the oldest entry is evicted, not the whole memo
+    sess.verify_session(sess.issue_session("user4"))
+    assert cookies[0] not in sess._verified
+    assert len(sess._verified) == 3
+
+
+def test_tampered_cookie_is_rejected():
+    cookie = sess.issue_session("admin@example.com")
+    payload, sig = cookie.split(".", 1)
+    forged = payload[:-1] + ("A" if payload[-1] != "A" else "B") + "." + sig
+    assert sess.verify_session(forged) is None